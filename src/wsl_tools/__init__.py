@@ -1,11 +1,15 @@
 """wsl-tools - handy classes for Windows Subsystem for Linux management."""
 from __future__ import annotations
 
-import csv
+import os
 import re
+import shlex
 import shutil
 import subprocess
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
@@ -14,21 +18,79 @@ from typing import Any
 from typing import Dict
 from typing import Iterator
 from typing import List
+from typing import NamedTuple
 from typing import Optional
-from typing import Sequence
+from typing import Tuple
 from typing import Union
 
 from xdg.DesktopEntry import DesktopEntry
 
-try:
-    from functools import cached_property  # type: ignore
-except ImportError:
-    from .cached_property import cached_property
+from .cached_property import cached_property
 
 
 WSL_EXE = "wsl.exe"
 """Base WSL executable."""
 
+APPS_WORKERS = 16
+"""Number of threads used to read the desktop entries of a distro."""
+
+REBOOT_TIMEOUT = 5.0
+"""Seconds to wait for the distro to stop while rebooting."""
+
+PROFILE_TTL = 2.0
+"""Seconds after which the user profile is checked again for changes."""
+
+_EXPORT_LINE_RE = re.compile(
+    r"^\s*export\s+(?P<var>\w+)\s*=(?P<value>.*)$", re.MULTILINE
+)
+"""Line exporting an environment variable in a shell profile."""
+
+_GTK_THEME_RE = re.compile(r"^\s*export\s+GTK_THEME\s*=.*$", re.MULTILINE)
+"""Line exporting the GTK theme in a shell profile."""
+
+_THEMES_SCRIPT = " ".join(
+    (
+        "for d in /usr/share/themes /usr/local/share/themes",
+        "~/.local/share/themes ~/.themes; do",
+        'for t in "$d"/*/; do for g in "$t"*gtk-*; do',
+        'if [ -d "$g" ]; then basename "$t"; break; fi;',
+        "done; done; done",
+    )
+)
+"""
+Script listing the installed GTK themes.
+
+A theme is a subdirectory of one of the themes folders
+that contains a folder with the "*gtk-*" pattern.
+"""
+
+_SHELL_SENTINEL = "__WSL_TOOLS_DONE__"
+"""Line printed by the persistent shell after each command, with its status."""
+
+# flags of the user profile settings
+_GTK_THEME_FLAG = 1
+_GDK_SCALE_FLAG = 2
+_QT_SCALE_FLAG = 4
+
+_BOOTSTRAP_SEP = "__WSL_TOOLS_SECTION__"
+"""Separator of the sections printed by the bootstrap script."""
+
+_BOOTSTRAP_SCRIPT = "set -e; " + f"; echo {_BOOTSTRAP_SEP}; ".join(
+    (
+        "wslpath -w /",
+        'wslpath -w "$(realpath ~)"',
+        "echo ~",
+        'if [ -e ~/.profile ]; then wslpath -w "$(realpath ~/.profile)"; fi',
+        "cat /etc/resolv.conf 2>/dev/null || true",
+    )
+)
+"""
+Script printing the distro paths and nameserver in a single run.
+
+It fails if the root or home paths cannot be converted;
+the .profile and resolv.conf sections are left empty if missing.
+"""
+
 
 @dataclass
 class WSLApp:
@@ -49,7 +111,7 @@ class WSLApp:
     ico: Optional[str] = None
 
     @classmethod
-    def from_dotdesktop(cls, app_def: Path) -> WSLApp:
+    def from_dotdesktop(cls, app_def: Union[Path, str]) -> WSLApp:
         """
         Return a WSLApp from a .desktop file.
 
@@ -67,6 +129,16 @@ class WSLApp:
         raise IOError("Cannot read the .desktop entry")
 
 
+class _BootstrapValues(NamedTuple):
+    """Values queried by the bootstrap script of a distro."""
+
+    root_unc_path: Path
+    home_unc_path: Path
+    home_path: PurePosixPath
+    profile_unc_path: Path
+    ip: Optional[str]
+
+
 @dataclass
 class WSLDistro:
     """
@@ -79,24 +151,67 @@ class WSLDistro:
 
     name: str
     version: int
-    _profile: Optional[str] = field(default=None, init=False)
+    _profile_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _profile_mtime: Optional[int] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _profile_checked: float = field(
+        default=0.0, init=False, repr=False, compare=False
+    )
+    _exports_cache: Optional[Dict[str, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _profile_flags: int = field(
+        default=0, init=False, repr=False, compare=False
+    )
+    _shell: Optional[subprocess.Popen[bytes]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _shell_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
 
     def __str__(self) -> str:
         """Friendlier WSL name."""
         return self.name.replace("-", " ").capitalize()
 
+    def __del__(self) -> None:
+        """Terminate the persistent shell, if any."""
+        if getattr(self, "_shell", None) is not None:
+            self.close()
+
     @cached_property
     def shell(self) -> str:
-        """Default user shell path."""
+        """
+        Default user shell path.
+
+        Raises:
+            LookupError: if no user in /etc/passwd has the current home.
+        """
         home = str(self.home_path)
         with open(self.root_unc_path / "etc" / "passwd") as passwd:
-            line = next(itm for itm in passwd.readlines() if home in itm)
-            return line.split(":")[-1].strip()
+            for line in passwd:
+                parts = line.rstrip("\n").split(":")
+                if len(parts) >= 7 and parts[5] == home:
+                    return parts[6]
+        raise LookupError(home)
 
     @cached_property
-    def _cmd_base(self) -> str:
-        """Base command for launching programs in the WSL distro."""
-        return f"{WSL_EXE} ~ -d {self.name}"
+    def _argv_base(self) -> List[str]:
+        """Base arguments for launching programs in the WSL distro."""
+        return [WSL_EXE, "~", "-d", self.name]
+
+    def _sh_argv(self, command: str, load_profile: bool) -> List[str]:
+        """
+        Arguments for running the command with sh in the WSL distro.
+
+        The `--exec` flag passes the arguments to sh as they are,
+        without going through the parsing of the default user shell.
+        """
+        login = "l" if load_profile else ""
+        return [*self._argv_base, "--exec", "sh", f"-c{login}", command]
 
     def run_command(
         self,
@@ -115,9 +230,7 @@ class WSLDistro:
         Returns:
             The result of the subprocess call.
         """
-        login = "l" if load_profile else ""
-        command = f"sh -c{login} '{command}'"
-        return subprocess.run(f"{self._cmd_base} {command}", **kwargs)
+        return subprocess.run(self._sh_argv(command, load_profile), **kwargs)
 
     def run_background_command(
         self,
@@ -138,14 +251,93 @@ class WSLDistro:
         Returns:
             The result of the subprocess call.
         """
-        login = "l" if load_profile else ""
-        command = f"sh -c{login} '{command}'"
-        return subprocess.Popen(f"{self._cmd_base} {command}", **kwargs)
+        return subprocess.Popen(self._sh_argv(command, load_profile), **kwargs)
+
+    def _exec(self, cmd: str) -> str:
+        """
+        Run a command in the persistent shell and return its output.
+
+        The shell is started on the first call and reused afterwards,
+        to avoid the startup time of wsl.exe.
+        Each command runs in its own sh process, followed by a sentinel
+        line holding a per-call nonce and its exit status.
+        If the output cannot be read up to the sentinel, the shell is killed
+        so that the next command starts from a clean one.
+
+        Args:
+            cmd: commmand to run in the WSL distro.
+
+        Returns:
+            command output.
+
+        Raises:
+            CalledProcessError: if the command or the shell fail.
+        """
+        with self._shell_lock:
+            if self._shell is None or self._shell.poll() is not None:
+                self._shell = subprocess.Popen(
+                    [*self._argv_base, "--exec", "sh"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            shell = self._shell
+            try:
+                lines, returncode = self._exec_in(shell, cmd)
+            except BaseException:
+                self._shell = None
+                shell.kill()
+                shell.communicate()
+                raise
+        # drop the newline printed before the sentinel
+        output = b"".join(lines)[:-1].decode()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, output)
+        return output
+
+    @staticmethod
+    def _exec_in(
+        shell: subprocess.Popen[bytes], cmd: str
+    ) -> Tuple[List[bytes], int]:
+        """Write the command to the shell and read its output and status."""
+        stdin, stdout = shell.stdin, shell.stdout
+        if stdin is None or stdout is None:
+            raise subprocess.CalledProcessError(-1, cmd)
+        # the nonce keeps the command output from faking the sentinel
+        nonce = uuid.uuid4().hex
+        sentinel = re.compile(rf"{_SHELL_SENTINEL} {nonce} (\d+)\n".encode())
+        # quoting the command as a single word turns syntax errors
+        # into a non-zero exit status instead of an unterminated input
+        stdin.write(
+            f"sh -c {shlex.quote(cmd)} </dev/null; "
+            f"printf '\\n{_SHELL_SENTINEL} {nonce} %d\\n' $?\n".encode()
+        )
+        stdin.flush()
+        lines = []
+        line = stdout.readline()
+        match = sentinel.fullmatch(line)
+        while match is None:
+            if not line:
+                raise subprocess.CalledProcessError(shell.wait(), cmd)
+            lines.append(line)
+            line = stdout.readline()
+            match = sentinel.fullmatch(line)
+        return lines, int(match.group(1))
+
+    def close(self) -> None:
+        """Terminate the persistent shell, if any."""
+        with self._shell_lock:
+            shell, self._shell = self._shell, None
+        if shell is not None:
+            shell.terminate()
+            shell.communicate()
 
     def get_cmd_output(self, cmd: str, **kwargs: Any) -> str:
         """
         Run a command in the distro and return the stdout output as text.
 
+        The command runs in the persistent shell of the distro,
+        unless subprocess arguments are given.
+
         Args:
             cmd: commmand to run in the WSL distro.
             kwargs: arguments to pass to subprocess.Popen
@@ -153,6 +345,8 @@ class WSLDistro:
         Returns:
             command output.
         """
+        if not kwargs:
+            return self._exec(cmd)
         run = self.run_command(
             cmd,
             check=True,
@@ -179,6 +373,33 @@ class WSLDistro:
         """
         return self._unc_path_from_cmd(path).read_text()
 
+    @cached_property
+    def _bootstrap_values(self) -> _BootstrapValues:
+        """
+        Paths and ip of the distro, queried with a single WSL invocation.
+
+        Raises:
+            CalledProcessError: if the WSL paths cannot be queried.
+            ValueError: if the root or home paths are missing in the output.
+        """
+        output = self.get_cmd_output(_BOOTSTRAP_SCRIPT)
+        root, home, home_path, profile, resolv = (
+            section.strip() for section in output.split(_BOOTSTRAP_SEP)
+        )
+        if not (root and home and home_path):
+            raise ValueError(
+                f"Cannot find the root and home paths of {self.name}"
+            )
+        return _BootstrapValues(
+            root_unc_path=Path(root),
+            home_unc_path=Path(home),
+            home_path=PurePosixPath(home_path),
+            profile_unc_path=(
+                Path(profile) if profile else Path(home) / ".profile"
+            ),
+            ip=_nameserver(resolv),
+        )
+
     @cached_property
     def ip(self) -> str:
         """
@@ -186,61 +407,128 @@ class WSLDistro:
 
         Extract the IP from the `/etc/resolv.conf` `nameserver` entry.
         """
-        for line in self.read_file("/etc/resolv.conf").splitlines():
-            if "nameserver" in line:
-                return line.split()[1]
-        raise ValueError("Cannot find ip in /etc/resolv.conf")
+        ip = self._bootstrap_values.ip
+        if ip is None:
+            raise ValueError("Cannot find ip in /etc/resolv.conf")
+        return ip
 
     @cached_property
     def root_unc_path(self) -> Path:
         """UNC path of the root."""
-        return self._unc_path_from_cmd("/")
+        return self._bootstrap_values.root_unc_path
 
     @cached_property
     def home_unc_path(self) -> Path:
         """UNC path of the user home."""
-        return self._unc_path_from_cmd("~")
+        return self._bootstrap_values.home_unc_path
 
     @cached_property
     def home_path(self) -> PurePosixPath:
         """POSIX path of the user home."""
-        return PurePosixPath(self.get_cmd_output("echo ~").strip())
+        return self._bootstrap_values.home_path
 
     @cached_property
     def profile_unc_path(self) -> Path:
-        """UNC path of user .profile."""
+        """UNC path of user .profile, returned even if it doesn't exist."""
+        return self._bootstrap_values.profile_unc_path
+
+    def _profile_mtime_ns(self) -> Optional[int]:
+        """Modification time of the user .profile, if it exists."""
         try:
-            return self._unc_path_from_cmd("~/.profile")
-        except subprocess.CalledProcessError:
-            return self.home_unc_path / ".profile"  # type: ignore
+            return self.profile_unc_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
 
     @property
     def profile(self) -> str:
-        """User .profile contents."""
-        if self._profile is None:
+        """
+        User .profile contents.
+
+        The contents are cached, and read again only if the file
+        modification time changed since the last check.
+        The check is done at most once every `PROFILE_TTL` seconds.
+        """
+        now = time.monotonic()
+        if (
+            self._profile_cache is not None
+            and now - self._profile_checked < PROFILE_TTL
+        ):
+            return self._profile_cache
+        self._profile_checked = now
+        mtime = self._profile_mtime_ns()
+        if self._profile_cache is None or mtime != self._profile_mtime:
             try:
-                self._profile = self.profile_unc_path.read_text()
+                self._profile_cache = self.profile_unc_path.read_text()
             except FileNotFoundError:
-                self._profile = ""
-        return self._profile
+                self._profile_cache = ""
+            self._profile_mtime = mtime
+            self._exports_cache = None
+        return self._profile_cache
 
     @profile.setter
     def profile(self, value: str) -> None:
         """Writes the value into the user profile."""
-        self._profile = value
         self.profile_unc_path.write_text(value)
+        self._profile_cache = value
+        self._profile_mtime = self._profile_mtime_ns()
+        self._profile_checked = time.monotonic()
+        self._exports_cache = None
+
+    def _scan_profile(self) -> Dict[str, str]:
+        """Parse exported variables and flags of the profile, once per change."""
+        profile = self.profile
+        if self._exports_cache is None:
+            exports = {
+                m.group("var"): m.group("value").strip().strip("\"'")
+                for m in _EXPORT_LINE_RE.finditer(profile)
+            }
+            flags = 0
+            if exports.get("GTK_THEME"):
+                flags |= _GTK_THEME_FLAG
+            if exports.get("GDK_SCALE") == "2":
+                flags |= _GDK_SCALE_FLAG
+            if exports.get("QT_SCALE_FACTOR") == "2":
+                flags |= _QT_SCALE_FLAG
+            self._exports_cache = exports
+            self._profile_flags = flags
+        return self._exports_cache
+
+    @property
+    def _exports(self) -> Dict[str, str]:
+        """Variables exported in the user profile."""
+        return self._scan_profile()
+
+    @property
+    def _flags(self) -> int:
+        """Flags of the settings found in the user profile."""
+        self._scan_profile()
+        return self._profile_flags
+
+    def is_running(self) -> bool:
+        """True if the distro is running."""
+        lines = _wsl_output("-l", "--running").splitlines()[1:]
+        return any(line.split()[:1] == [self.name] for line in lines)
 
     def reboot(self) -> None:
-        """Reboot the distro."""
+        """
+        Reboot the distro.
+
+        Raises:
+            CalledProcessError: if the distro cannot be terminated.
+        """
         # TODO: daemon thread
-        subprocess.run(f"{WSL_EXE} -t {self.name}")
-        time.sleep(1)
-        subprocess.run(f"{WSL_EXE} -d {self.name}")
+        self.close()
+        subprocess.run([WSL_EXE, "-t", self.name], check=True)
+        deadline = time.monotonic() + REBOOT_TIMEOUT
+        while self.is_running() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        subprocess.run([WSL_EXE, "-d", self.name, "--exec", "true"])
 
     def remove(self) -> None:
         """Unregister the distro."""
         # WARNING: handle with care!
-        subprocess.run(f"{WSL_EXE} --unregister {self.name}")
+        self.close()
+        subprocess.run([WSL_EXE, "--unregister", self.name])
 
     def run_sudo(self, command: str, sudo_password: str) -> None:
         """Run the commmand with sudo."""
@@ -249,80 +537,85 @@ class WSLDistro:
     def open_in_shell(self) -> None:
         """Open the distro in windows terminal, if installed, or cmd."""
         p = subprocess.run(
-            f"wt -p {self.name}",
+            ["wt", "-p", self.name],
             creationflags=subprocess.DETACHED_PROCESS,
         )
         if p.returncode:
             subprocess.Popen(
-                f"cmd.exe /k {WSL_EXE} ~ -d {self.name}",
+                ["cmd.exe", "/k", *self._argv_base],
                 creationflags=subprocess.DETACHED_PROCESS,
             )
 
     @property
     def theme(self) -> str:
         """Get/set the GTK theme name stored in user profile."""
-        try:
-            theme_line = next(
-                line
-                for line in self.profile.splitlines()
-                if "GTK_THEME=" in line
-            )
-            return theme_line.split("GTK_THEME=")[-1]
-        except StopIteration:
-            return "Default"
+        return self._exports.get("GTK_THEME") or "Default"
 
     @theme.setter
     def theme(self, value: str) -> None:
         """Set the GTK theme variable in the user profile."""
         profile = self.profile
         new_line = f'export GTK_THEME="{value}"' if value != "Default" else ""
-        if "export GTK_THEME=" not in profile:
+        if "GTK_THEME" not in self._exports:
             self.profile = f"{profile}{new_line}\n"
         else:
-            regex = re.compile(r"^\s*export GTK_THEME=.*", re.MULTILINE)
-            self.profile = regex.sub(profile, new_line)
+            self.profile = _GTK_THEME_RE.sub(lambda _: new_line, profile)
 
-    @cached_property
+    @property
     def theme_env(self) -> str:
         """
         Return the GTK theme envvar if set.
 
         Defaults to Adawaita.
         """
-        return "$GTK_THEME" if "GTK_THEME" in self.profile else "Adwaita"
+        return "$GTK_THEME" if self._flags & _GTK_THEME_FLAG else "Adwaita"
 
     @cached_property
     def themes(self) -> List[str]:
         """List of GTK themes."""
-        usr = self.root_unc_path / "usr"
-        home = self.home_unc_path
-        folders_to_check = (
-            usr / "share" / "themes",
-            usr / "local" / "share" / "themes",
-            home / ".local" / "share" / "themes",
-            home / ".themes",
-        )
-        return sorted(_get_themes(folders_to_check), key=str.casefold)
+        themes = set(self.get_cmd_output(_THEMES_SCRIPT).splitlines())
+        return sorted(themes, key=str.casefold)
+
+    def _read_app(self, app: str) -> WSLApp:
+        """Return the WSLApp of a .desktop file, resolving symlinks in WSL."""
+        try:
+            return WSLApp.from_dotdesktop(app)
+        except IOError:
+            return WSLApp.from_dotdesktop(
+                self._unc_path_from_cmd(wsl_posix_path(Path(app)))
+            )
+
+    @cached_property
+    def _scan_cache(self) -> Tuple[Dict[str, WSLApp], Dict[str, WSLApp]]:
+        """All the apps and the GUI apps, collected in a single scan."""
+        return self._scan_apps()
+
+    def _scan_apps(self) -> Tuple[Dict[str, WSLApp], Dict[str, WSLApp]]:
+        """Read the desktop entries and split out the GUI apps."""
+        app_dir = self.root_unc_path / "usr" / "share" / "applications"
+        all_apps = {}
+        gui_apps = {}
+        with ThreadPoolExecutor(max_workers=APPS_WORKERS) as executor:
+            wsl_apps = executor.map(
+                self._read_app, _iter_desktop_files(str(app_dir))
+            )
+            for wsl_app in wsl_apps:
+                all_apps[wsl_app.name] = wsl_app
+                if wsl_app.gui:
+                    gui_apps[wsl_app.name] = wsl_app
+                else:
+                    gui_apps.pop(wsl_app.name, None)
+        return all_apps, gui_apps
 
     @cached_property
     def apps(self) -> Dict[str, WSLApp]:
         """Container of apps with a desktop entry."""
-        app_dir = self.root_unc_path / "usr" / "share" / "applications"
-        apps = {}
-        for app in app_dir.glob("**/*.desktop"):
-            try:
-                wsl_app = WSLApp.from_dotdesktop(app)
-            except IOError:
-                wsl_app = WSLApp.from_dotdesktop(
-                    self._unc_path_from_cmd(wsl_posix_path(app))
-                )
-            apps[wsl_app.name] = wsl_app
-        return apps
+        return self._scan_cache[0]
 
     @cached_property
     def gui_apps(self) -> Dict[str, WSLApp]:
         """List of GUI apps with a desktop entry."""
-        return {k: v for k, v in self.apps.items() if v.gui}
+        return self._scan_cache[1]
 
     def set_display(self) -> None:
         """Set the DISPLAY envvar in the user profile."""
@@ -332,19 +625,21 @@ class WSLDistro:
     def _edit_profile_export(self, variable: str, value: Any) -> None:
         profile = self.profile
         new_line = f"export {variable}={value}"
-        if f"export {variable}" not in profile:
+        if variable not in self._exports:
             profile = profile if profile.endswith("\n") else f"{profile}\n"
             self.profile = f"{profile}{new_line}\n"
         else:
-            regex = re.compile(
-                f"^\\s*export\\s+{variable}\\s*=.*", re.MULTILINE
+            self.profile = _EXPORT_LINE_RE.sub(
+                lambda m: new_line
+                if m.group("var") == variable
+                else m.group(0),
+                profile,
             )
-            self.profile = regex.sub(profile, new_line)
 
     @property
     def gtk_scale(self) -> int:
         """GTK applications scale factor."""
-        return 2 if "GDK_SCALE=2" in self.profile else 1
+        return 2 if self._flags & _GDK_SCALE_FLAG else 1
 
     @gtk_scale.setter
     def gtk_scale(self, scale: int) -> None:
@@ -356,7 +651,7 @@ class WSLDistro:
     @property
     def qt_scale(self) -> int:
         """QT applications scale factor."""
-        return 2 if "QT_SCALE_FACTOR=2" in self.profile else 1
+        return 2 if self._flags & _QT_SCALE_FLAG else 1
 
     @qt_scale.setter
     def qt_scale(self, scale: int) -> None:
@@ -386,26 +681,37 @@ class WSLDistro:
             self.profile = f"{profile}\nsudo /etc/init.d/dbus start\n"
 
 
-def _get_themes(themes_dirs: Sequence[Path]) -> Iterator[str]:
+def _iter_desktop_files(root: str) -> Iterator[str]:
+    """Return the paths of the .desktop files inside the given directory."""
+    dirs = [root]
+    while dirs:
+        try:
+            entries = list(os.scandir(dirs.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.name.endswith(".desktop"):
+                yield entry.path
+
+
+def _wsl_output(*args: str) -> str:
     """
-    Return the names of the themes installed in the given directories.
+    Run wsl.exe with the given arguments and return its output as text.
 
-    To determine if a subdirectory is a theme one, check the existence
-    of a folder with the "*gtk-*" pattern inside it.
+    wsl.exe writes UTF-16 text, possibly with a BOM and spurious NULs.
     """
-    for themes_dir in themes_dirs:
-        if not themes_dir.exists():
-            continue
-        for path in _subdirs(themes_dir):
-            for subpath in _subdirs(path):
-                if "gtk-" in subpath.name:
-                    yield path.name
-                    break
+    output = subprocess.run([WSL_EXE, *args], capture_output=True).stdout
+    return output.decode("utf-16-le").replace("\x00", "").replace("\ufeff", "")
 
 
-def _subdirs(base_dir: Path) -> Iterator[Path]:
-    """Return the subdirectories inside the given directory."""
-    return (p for p in base_dir.iterdir() if p.is_dir())
+def _nameserver(resolv_conf: str) -> Optional[str]:
+    """Return the first nameserver of a resolv.conf content, if any."""
+    for line in resolv_conf.splitlines():
+        if "nameserver" in line:
+            return line.split()[1]
+    return None
 
 
 def wsl_posix_path(unc_path: Path) -> str:
@@ -430,56 +736,66 @@ class WSLManager:
 
     It is a user dictionary with the distribution names as keys, and the
     related WSLDistro object as value.
+    The distributions are enumerated on first access.
 
     Args:
         blacklist: list of distributions to ignore. Contains docker by default.
     """
 
     def __init__(self, blacklist: Optional[List[str]] = None) -> None:
-        self._distros: Dict[str, WSLDistro] = {}
+        self._distros: Optional[Dict[str, WSLDistro]] = None
         if not self.installed:
             # TODO: try to install it automatically
             raise FileNotFoundError("Cannot find wsl, install it first.")
-        self._blacklist = blacklist or ["docker"]
-        self._get_machines()
+        self._blacklist_re = re.compile(
+            "|".join(re.escape(b) for b in blacklist or ["docker"])
+        )
 
     def __getitem__(self, item: str) -> WSLDistro:
         """Return the WSLDistro with the specified name."""
-        return self._distros[item]
+        return self._ensure_loaded()[item]
 
     def __iter__(self) -> Iterator[str]:
         """Iterates through the distribution dictionary."""
-        return iter(self._distros)
+        return iter(self._ensure_loaded())
 
     def __len__(self) -> int:
         """Number of distributions installed."""
-        return len(self._distros)
+        return len(self._ensure_loaded())
 
     def refresh(self) -> None:
         """Refresh the dictionary of distributions."""
-        self._distros.clear()
-        self._get_machines()
-
-    def _get_machines(self) -> None:
-        result = subprocess.run(
-            [WSL_EXE, "-l", "-v"],
-            capture_output=True,
-            text=True,
-            encoding="utf-16-le",
-        ).stdout.splitlines()
-        lines = [line[2:] for line in result if line]
-        reader = csv.DictReader(lines, delimiter=" ", skipinitialspace=True)
-        for machine in reader:
-            name = machine.get("NAME")
-            if name and all(b not in name for b in self._blacklist):
-                self._distros[name] = WSLDistro(
-                    name, int(machine.get("VERSION", 1))
-                )
+        self._distros = self._get_machines()
+
+    def _ensure_loaded(self) -> Dict[str, WSLDistro]:
+        """Return the distributions, enumerating them on the first call."""
+        if self._distros is None:
+            self._distros = self._get_machines()
+        return self._distros
+
+    def _get_machines(self) -> Dict[str, WSLDistro]:
+        distros: Dict[str, WSLDistro] = {}
+        result = _wsl_output("-l", "-v")
+        # the first two columns hold the "*" marker of the default distro
+        lines = [line[2:] for line in result.splitlines() if line.strip()]
+        if not lines:
+            return distros
+        header = lines[0].split()
+        if "NAME" not in header or "VERSION" not in header:
+            return distros
+        name_idx = header.index("NAME")
+        ver_idx = header.index("VERSION")
+        for line in lines[1:]:
+            parts = line.split()
+            name = parts[name_idx]
+            if not self._blacklist_re.search(name):
+                distros[name] = WSLDistro(name, int(parts[ver_idx]))
+        return distros
 
     @property
     def names(self) -> List[str]:
         """List of available WSL machine names."""
-        return list(self._distros.keys())
+        return list(self._ensure_loaded().keys())
 
     @property
     def installed(self) -> bool:
@@ -494,7 +810,7 @@ class WSLManager:
     def import_distro(
         self,
         name: str,
-        tarball: str,
+        tarball: Union[Path, str],
         workdir: Union[Path, str],
         version: int = 2,
     ) -> WSLDistro:
@@ -511,7 +827,16 @@ class WSLManager:
             WSLDistro of the created distro.
         """
         subprocess.run(
-            f"{WSL_EXE} --import {name} {workdir} {tarball} --version {version}"
+            [
+                WSL_EXE,
+                "--import",
+                name,
+                str(workdir),
+                str(tarball),
+                "--version",
+                str(version),
+            ]
         )
-        self._distros[name] = WSLDistro(name, version)
-        return self._distros[name]
+        distros = self._ensure_loaded()
+        distros[name] = WSLDistro(name, version)
+        return distros[name]
@@ -1,35 +1,56 @@
-"""Cached property for Python < 3.8."""
+"""Cached property, with a backport for Python < 3.8."""
 from __future__ import annotations
 
-import inspect
-from typing import Any
-from typing import Callable
-from typing import Generic
-from typing import TypeVar
-
-_T = TypeVar("_T")
-_S = TypeVar("_S")
-
-
-class cached_property(Generic[_T]):  # noqa: N801
-    """
-    A property that is only computed once per instance and then replaces itself
-    with an ordinary attribute.
-
-    Deleting the attribute resets the property.
-    Source: https://github.com/pydanny/cached-property
-    """  # noqa
-
-    def __init__(self, func: Callable[[Any], _T]) -> None:
-        self.__doc__ = func.__doc__
-        self.__name__ = func.__name__
-        self.__signature__ = inspect.signature(func)
-        self.func = func
-
-    def __get__(self, obj: _S, cls: Any) -> _T:
-        """Return the cached object or compute its value."""
-        if obj is None:
-            return self  # type: ignore
-
-        value = obj.__dict__[self.__name__] = self.func(obj)
-        return value
+import sys
+
+if sys.version_info >= (3, 8):
+    from functools import cached_property  # noqa: F401
+else:
+    from typing import Any
+    from typing import Callable
+    from typing import Generic
+    from typing import Optional
+    from typing import TypeVar
+
+    _T = TypeVar("_T")
+    _S = TypeVar("_S")
+
+    # A property that is only computed once per instance and then replaces
+    # itself with an ordinary attribute.
+    #
+    # Deleting the attribute resets the property.
+    # Source: https://github.com/pydanny/cached-property
+    #
+    # This is a non-data descriptor: the cached value in the instance __dict__
+    # takes precedence over it, so __get__ only runs on the first access.
+    # Defining __set__ or __delete__ would make it a data descriptor and run
+    # __get__ on every access; the owner class must also have a __dict__.
+    #
+    # The class has no docstring because the "__doc__" slot, which holds the
+    # docstring of the decorated function, would conflict with it.
+    class cached_property(Generic[_T]):  # noqa: N801, D101
+        __slots__ = ("func", "attrname", "__doc__")
+
+        func: Callable[[Any], _T]
+        attrname: Optional[str]
+
+        def __init__(self, func: Callable[[Any], _T]) -> None:
+            self.__doc__ = func.__doc__
+            self.func = func
+            self.attrname = None
+
+        def __set_name__(self, owner: Any, name: str) -> None:
+            """Store the name of the attribute the property is assigned to."""
+            self.attrname = name
+
+        def __get__(self, obj: _S, cls: Any) -> _T:
+            """Return the cached object or compute its value."""
+            if obj is None:
+                return self  # type: ignore
+            if self.attrname is None:
+                raise TypeError(
+                    "Cannot use cached_property without __set_name__."
+                )
+
+            value = obj.__dict__[self.attrname] = self.func(obj)
+            return value
@@ -0,0 +1,10 @@
+"""wsl-tools test configuration."""
+
+
+def pytest_addoption(parser) -> None:
+    """Add the option to keep the test distro between runs."""
+    parser.addoption(
+        "--keep-distro",
+        action="store_true",
+        help="don't unregister the test distro, to reuse it on the next run",
+    )
@@ -1,8 +1,20 @@
 """wsl-tools tests."""
+import functools
+import hashlib
 import ipaddress
+import os
+import subprocess
+import sys
+import tempfile
 from pathlib import Path
+from pathlib import PurePosixPath
 
 import pytest
+import wsl_tools
+from wsl_tools import _iter_desktop_files
+from wsl_tools import _nameserver
+from wsl_tools import _wsl_output
+from wsl_tools import WSL_EXE
 from wsl_tools import wsl_posix_path
 from wsl_tools import WSLApp
 from wsl_tools import WSLDistro
@@ -10,6 +22,21 @@ from wsl_tools import WSLManager
 from xdg.Exceptions import ParsingError
 
 BASE_DISTRO = "alpine-base"
+BASE_TARBALL = (
+    Path(__file__).parent / "distros" / f"{BASE_DISTRO}.tar"
+).resolve()
+
+
+_ip_check = functools.lru_cache(maxsize=8)(ipaddress.ip_address)
+
+
+def tarball_digest(tarball: Path) -> str:
+    """Short sha256 fingerprint of the tarball."""
+    digest = hashlib.sha256()
+    with tarball.open("rb") as tar:
+        for chunk in iter(lambda: tar.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
 
 
 @pytest.fixture(scope="session")
@@ -19,13 +46,46 @@ def manager() -> WSLManager:
 
 
 @pytest.fixture(scope="session")
-def test_distro(tmp_path_factory, manager: WSLManager) -> WSLDistro:
-    """Import a temporary base alpine distribution."""
-    tarfile = Path(f"distros\\{BASE_DISTRO}.tar").resolve()
-    distro_dir = tmp_path_factory.mktemp("distro")
-    distro = manager.import_distro(BASE_DISTRO, tarfile, distro_dir)
+def keep_distro(request) -> bool:
+    """True if the test distro is kept for the next runs."""
+    return request.config.getoption("--keep-distro")
+
+
+@pytest.fixture(scope="session")
+def leftover_distro(manager: WSLManager) -> bool:
+    """True if the test distro was kept from a previous run."""
+    return BASE_DISTRO in manager
+
+
+@pytest.fixture(scope="session")
+def test_distro(
+    keep_distro: bool, leftover_distro: bool, manager: WSLManager
+) -> WSLDistro:
+    """
+    Import a temporary base alpine distribution.
+
+    The distro folder is named after the tarball hash, so that a distro
+    kept from a previous run is reused only if the tarball didn't change.
+    """
+    digest = tarball_digest(BASE_TARBALL)
+    distro_dir = Path(tempfile.gettempdir()) / f"wsl-tools-{digest}"
+    if leftover_distro and distro_dir.exists():
+        distro = manager[BASE_DISTRO]
+    else:
+        if leftover_distro:
+            manager[BASE_DISTRO].remove()
+        distro = manager.import_distro(BASE_DISTRO, BASE_TARBALL, distro_dir)
     yield distro
-    distro.remove()
+    if not keep_distro:
+        distro.remove()
+
+
+@pytest.fixture
+def restore_profile(test_distro: WSLDistro) -> None:
+    """Restore the user profile after the test changed it."""
+    profile = test_distro.profile
+    yield
+    test_distro.profile = profile
 
 
 @pytest.fixture
@@ -68,17 +128,19 @@ def test_manager_wsl_installed(manager: WSLManager) -> None:
     assert manager.installed  # this will change based on your setup
 
 
-def test_manager_names(manager: WSLManager) -> None:
+def test_manager_names(manager: WSLManager, leftover_distro: bool) -> None:
     """Docker distros are blacklisted."""
     names = manager.names
     assert all("docker" not in name.lower() for name in names)
-    assert all(BASE_DISTRO not in name.lower() for name in names)
+    if not leftover_distro:
+        assert all(BASE_DISTRO not in name.lower() for name in names)
 
 
-def test_manager_dict(manager: WSLManager) -> None:
+def test_manager_dict(manager: WSLManager, leftover_distro: bool) -> None:
     """Docker distros are blacklisted."""
     assert all("docker" not in name for name in manager)
-    assert BASE_DISTRO not in manager
+    if not leftover_distro:
+        assert BASE_DISTRO not in manager
 
 
 def test_manager_names_distro_imported(
@@ -152,7 +214,7 @@ def test_gui_apps(test_distro: WSLDistro) -> None:
 def test_ip(test_distro: WSLDistro) -> None:
     """Ip property return a valid IP."""
     ip = test_distro.ip
-    assert ipaddress.ip_address(ip)
+    assert _ip_check(ip)
 
 
 def test_dbus(test_distro: WSLDistro) -> None:
@@ -170,6 +232,7 @@ def test_profile(test_distro: WSLDistro) -> None:
     assert test_distro.profile == profile
 
 
+@pytest.mark.usefixtures("restore_profile")
 def test_gtk_scale(test_distro: WSLDistro) -> None:
     """GTK scale factor read and written correctly."""
     assert test_distro.gtk_scale == 1
@@ -180,6 +243,7 @@ def test_gtk_scale(test_distro: WSLDistro) -> None:
         test_distro.gtk_scale = 3
 
 
+@pytest.mark.usefixtures("restore_profile")
 def test_qt_scale(test_distro: WSLDistro) -> None:
     """QT scale factor read and written correctly."""
     assert test_distro.qt_scale == 1
@@ -190,12 +254,313 @@ def test_qt_scale(test_distro: WSLDistro) -> None:
         test_distro.qt_scale = 3
 
 
-wsl_posix_path_args = [
-    (r"\\wsl$\Ubuntu-20.04\home\test\whatever", "/home/test/whatever")
-]
+wsl_posix_path_args = (
+    (r"\\wsl$\Ubuntu-20.04\home\test\whatever", "/home/test/whatever"),
+)
 
 
-@pytest.mark.parametrize(("unc", "expected"), wsl_posix_path_args)
+@pytest.mark.parametrize(
+    ("unc", "expected"), wsl_posix_path_args, ids=lambda p: p
+)
 def test_wsl_posix_path(unc: str, expected: str) -> None:
     """UNC path converted to linux path."""
     assert wsl_posix_path(Path(unc)) == expected
+
+
+posix_only = pytest.mark.skipif(
+    sys.platform == "win32", reason="needs a POSIX shell"
+)
+
+
+@pytest.fixture
+def shell_distro(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> WSLDistro:
+    """Distro running its commands in a local sh, with a fake wslpath."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    wsl = bin_dir / "wsl"
+    wsl.write_text(
+        '#!/bin/sh\nwhile [ "$1" != --exec ]; do shift; done\nshift\nexec "$@"\n'
+    )
+    wslpath = bin_dir / "wslpath"
+    wslpath.write_text(
+        '#!/bin/sh\n[ "$1" = -w ] && [ -n "$2" ] || exit 1\necho "W:$2"\n'
+    )
+    wsl.chmod(0o755)
+    wslpath.chmod(0o755)
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    distro = WSLDistro("shell", 2)
+    distro.__dict__["_argv_base"] = [str(wsl)]
+    yield distro
+    distro.close()
+
+
+@posix_only
+def test_exec(shell_distro: WSLDistro) -> None:
+    """Commands run one after the other in the same shell."""
+    assert shell_distro._exec("echo abc") == "abc\n"
+    shell = shell_distro._shell
+    assert shell_distro._exec("printf abc") == "abc"
+    assert shell_distro._shell is shell
+
+
+@posix_only
+def test_exec_returncode(shell_distro: WSLDistro) -> None:
+    """Non-zero exit status raises with the command output."""
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        shell_distro._exec("echo abc; exit 3")
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.output == "abc\n"
+    assert shell_distro._exec("echo def") == "def\n"
+
+
+@posix_only
+def test_exec_syntax_error(shell_distro: WSLDistro) -> None:
+    """Unbalanced quotes raise instead of hanging the shell."""
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        shell_distro._exec("realpath /tmp/it's")
+    assert exc_info.value.returncode == 2
+    assert shell_distro._exec("echo abc") == "abc\n"
+
+
+@posix_only
+def test_exec_fake_sentinel(shell_distro: WSLDistro) -> None:
+    """Output looking like the sentinel is not taken for it."""
+    output = shell_distro._exec("echo __WSL_TOOLS_DONE__ 0; echo after")
+    assert output == "__WSL_TOOLS_DONE__ 0\nafter\n"
+    assert shell_distro._exec("echo abc") == "abc\n"
+
+
+@posix_only
+def test_close(shell_distro: WSLDistro) -> None:
+    """Closing terminates the shell, the next command starts a new one."""
+    shell_distro._exec("true")
+    shell = shell_distro._shell
+    shell_distro.close()
+    assert shell_distro._shell is None
+    assert shell.poll() is not None
+    assert shell_distro._exec("echo abc") == "abc\n"
+    assert shell_distro._shell is not shell
+
+
+@posix_only
+def test_bootstrap_values(shell_distro: WSLDistro, tmp_path: Path) -> None:
+    """Paths are read from a single script, .profile even if missing."""
+    home = (tmp_path / "home").resolve()
+    assert shell_distro.root_unc_path == Path("W:/")
+    assert shell_distro.home_unc_path == Path(f"W:{home}")
+    assert shell_distro.home_path == PurePosixPath(tmp_path / "home")
+    assert shell_distro.profile_unc_path == Path(f"W:{home}") / ".profile"
+
+
+@posix_only
+def test_bootstrap_values_profile(
+    shell_distro: WSLDistro, tmp_path: Path
+) -> None:
+    """Existing .profile is resolved by wslpath."""
+    profile = tmp_path / "home" / ".profile"
+    profile.touch()
+    assert shell_distro.profile_unc_path == Path(f"W:{profile.resolve()}")
+
+
+@posix_only
+def test_bootstrap_values_failure(
+    shell_distro: WSLDistro, tmp_path: Path
+) -> None:
+    """Failing wslpath raises instead of returning relative paths."""
+    (tmp_path / "bin" / "wslpath").write_text("#!/bin/sh\nexit 1\n")
+    with pytest.raises(subprocess.CalledProcessError):
+        assert shell_distro.root_unc_path
+
+
+@posix_only
+def test_bootstrap_values_empty(
+    shell_distro: WSLDistro, tmp_path: Path
+) -> None:
+    """Empty paths raise instead of being taken as the current folder."""
+    (tmp_path / "bin" / "wslpath").write_text("#!/bin/sh\n")
+    with pytest.raises(ValueError):
+        assert shell_distro.home_unc_path
+
+
+def test_nameserver() -> None:
+    """Nameserver is read from resolv.conf contents."""
+    resolv = "# generated\nnameserver 172.20.0.1\nnameserver 8.8.8.8\n"
+    assert _nameserver(resolv) == "172.20.0.1"
+    assert _nameserver("# nothing here\n") is None
+
+
+@pytest.fixture
+def offline_distro(tmp_path: Path) -> WSLDistro:
+    """Distro with its paths pointing to a temporary folder."""
+    distro = WSLDistro("offline", 2)
+    distro.__dict__["root_unc_path"] = tmp_path
+    distro.__dict__["home_path"] = PurePosixPath("/home/wsluser")
+    distro.__dict__["profile_unc_path"] = tmp_path / ".profile"
+    return distro
+
+
+def test_edit_profile_export(offline_distro: WSLDistro) -> None:
+    """Exports are replaced in place, leaving the rest of the profile."""
+    profile_path = offline_distro.profile_unc_path
+    profile_path.write_text("# comment\nexport GDK_SCALE=1\nexport FOO=bar\n")
+    offline_distro.gtk_scale = 2
+    offline_distro.qt_scale = 2
+    assert profile_path.read_text() == (
+        "# comment\nexport GDK_SCALE=2\nexport FOO=bar\n"
+        "export QT_SCALE_FACTOR=2\n"
+    )
+
+
+def test_theme_replace(offline_distro: WSLDistro) -> None:
+    """Theme line is replaced literally, even with backslashes."""
+    profile_path = offline_distro.profile_unc_path
+    profile_path.write_text('export FOO=bar\nexport GTK_THEME="Arc"\n')
+    offline_distro.theme = "Arc\\1"
+    assert profile_path.read_text() == (
+        'export FOO=bar\nexport GTK_THEME="Arc\\1"\n'
+    )
+
+
+def test_theme(offline_distro: WSLDistro) -> None:
+    """Theme is read without quotes, replaced and removed."""
+    profile_path = offline_distro.profile_unc_path
+    profile_path.write_text("export FOO=bar\n")
+    assert offline_distro.theme == "Default"
+    offline_distro.theme = "Adapta"
+    offline_distro.theme = "Arc"
+    assert offline_distro.theme == "Arc"
+    assert (
+        profile_path.read_text() == 'export FOO=bar\nexport GTK_THEME="Arc"\n'
+    )
+    offline_distro.theme = "Default"
+    assert offline_distro.theme == "Default"
+    assert profile_path.read_text().startswith("export FOO=bar\n")
+
+
+def test_profile_flags(offline_distro: WSLDistro) -> None:
+    """Theme env and scales follow the exports of the profile."""
+    offline_distro.profile_unc_path.write_text("export GDK_SCALE=1\n")
+    assert offline_distro.theme_env == "Adwaita"
+    assert offline_distro.gtk_scale == 1
+    assert offline_distro.qt_scale == 1
+    offline_distro.theme = "Arc"
+    offline_distro.gtk_scale = 2
+    offline_distro.qt_scale = 2
+    assert offline_distro.theme_env == "$GTK_THEME"
+    assert offline_distro.gtk_scale == 2
+    assert offline_distro.qt_scale == 2
+
+
+@posix_only
+def test_themes(shell_distro: WSLDistro, tmp_path: Path) -> None:
+    """Only folders with a gtk subfolder are themes, listed once."""
+    home = tmp_path / "home"
+    for theme_dir in (
+        home / ".themes" / "Arc" / "gtk-3.0",
+        home / ".themes" / "My Theme" / "gtk-2.0",
+        home / ".themes" / "Icons" / "cursors",
+        home / ".local" / "share" / "themes" / "Arc" / "gtk-4.0",
+    ):
+        theme_dir.mkdir(parents=True)
+    themes = shell_distro.themes
+    assert {"Arc", "My Theme"} <= set(themes)
+    assert "Icons" not in themes
+    assert themes.count("Arc") == 1
+
+
+WSL_LIST_OUTPUT = (
+    "  NAME                   STATE           VERSION\r\n"
+    "* Ubuntu-20.04           Running         2\r\n"
+    "  docker-desktop         Stopped         2\r\n"
+    "  alpine-base            Stopped         1\r\n"
+)
+
+
+def test_manager_get_machines(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Distros are parsed from wsl -l -v, skipping the blacklisted ones."""
+    monkeypatch.setattr(wsl_tools.shutil, "which", lambda _: WSL_EXE)
+    monkeypatch.setattr(wsl_tools, "_wsl_output", lambda *_: WSL_LIST_OUTPUT)
+    manager = WSLManager()
+    assert manager.names == ["Ubuntu-20.04", "alpine-base"]
+    assert manager["Ubuntu-20.04"].version == 2
+    assert manager["alpine-base"].version == 1
+
+
+def test_wsl_output(monkeypatch: pytest.MonkeyPatch) -> None:
+    """UTF-16 output is decoded without BOM and NULs."""
+    raw = ("\ufeff" + WSL_LIST_OUTPUT + "\x00").encode("utf-16-le")
+    monkeypatch.setattr(
+        wsl_tools.subprocess,
+        "run",
+        lambda *args, **kwargs: subprocess.CompletedProcess(args, 0, raw),
+    )
+    assert _wsl_output("-l", "-v") == WSL_LIST_OUTPUT
+
+
+def test_iter_desktop_files(tmp_path: Path) -> None:
+    """Desktop files are found in the subfolders too."""
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    for name in ("a.desktop", "sub/b.desktop", "sub/deep/c.desktop", "d.txt"):
+        (tmp_path / name).touch()
+    found = {
+        Path(p).relative_to(tmp_path)
+        for p in _iter_desktop_files(str(tmp_path))
+    }
+    assert found == {
+        Path("a.desktop"),
+        Path("sub/b.desktop"),
+        Path("sub/deep/c.desktop"),
+    }
+    assert not list(_iter_desktop_files(str(tmp_path / "missing")))
+
+
+def test_shell_passwd_home(offline_distro: WSLDistro) -> None:
+    """Shell is taken from the user with the exact home path."""
+    etc = offline_distro.root_unc_path / "etc"
+    etc.mkdir()
+    (etc / "passwd").write_text(
+        "root:x:0:0:/home/wsluser:/root:/bin/sh\n"
+        "wsluser:x:1000:1000::/home/wsluser:/bin/ash\n"
+    )
+    assert offline_distro.shell == "/bin/ash"
+
+
+@pytest.mark.parametrize(
+    "output,expected",
+    [
+        (
+            "Windows Subsystem for Linux Distributions:\r\n"
+            "Ubuntu (Default)\r\n"
+            "alpine-base\r\n",
+            True,
+        ),
+        ("There are no running distributions.\r\n", False),
+    ],
+)
+def test_is_running(
+    monkeypatch: pytest.MonkeyPatch, output: str, expected: bool
+) -> None:
+    """Running state is read from wsl -l --running, default or not."""
+    monkeypatch.setattr(wsl_tools, "_wsl_output", lambda *_: output)
+    assert WSLDistro("Ubuntu", 2).is_running() is expected
+    assert not WSLDistro("Ubuntu-20.04", 2).is_running()
+
+
+def test_reboot(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Reboot terminates the distro and waits for it to start again."""
+    calls = []
+
+    def run(args, **kwargs):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0)
+
+    monkeypatch.setattr(wsl_tools.subprocess, "run", run)
+    monkeypatch.setattr(wsl_tools, "_wsl_output", lambda *_: "")
+    WSLDistro("Ubuntu", 2).reboot()
+    assert calls == [
+        [WSL_EXE, "-t", "Ubuntu"],
+        [WSL_EXE, "-d", "Ubuntu", "--exec", "true"],
+    ]